@@ -1,47 +1,193 @@
+from dataclasses import astuple
 from typing import Any
 
 import numpy as np
 from pydantic import BaseModel
-from scipy.interpolate import interp1d
-from scipy.optimize import differential_evolution
+from scipy.optimize import differential_evolution, least_squares, minimize
 
-from fea_model import CalibrationParams
+from enums import CalibrationMethods
+from fea_model import CalibrationParams, Pile
 from load_tests import LoadTestResult
 
 
+def _interp(x, xp, fp):
+    """Same as np.interp but extrapolates linearly out of the xp range
+    like interp1d(kind="linear", fill_value="extrapolate")"""
+    y = np.interp(x, xp, fp)
+    below = x < xp[0]
+    y[below] += (fp[1] - fp[0]) / (xp[1] - xp[0]) * (x[below] - xp[0])
+    above = x > xp[-1]
+    y[above] += (fp[-1] - fp[-2]) / (xp[-1] - xp[-2]) * (x[above] - xp[-1])
+    return y
+
+
+# cost, args and pile head curve of the best analysis of this process since the last
+# calibration started, so the calibrated curve doesn't have to be analyzed again
+_best_analysis: tuple[float, np.ndarray, tuple[np.ndarray, np.ndarray]] | None = None
+# every analysis of this process writes its pile head curve into these arrays
+_curve_buffers: tuple[np.ndarray, np.ndarray] | None = None
+# pile arguments and pile of the last analysis of this process
+_pile_cache: tuple[dict[str, Any], Pile] | None = None
+
+
+def _get_pile(calibration_params: CalibrationParams, load_test_result: LoadTestResult):
+    """Pile of the load test with the calibration params
+    The pile of the previous call is reused when its arguments are the same and only its
+    soil springs are replaced, opensees holds a single model so only the last pile can be
+    analyzed anyway. Arguments are compared by value, so multiprocessing workers reuse
+    their pile across tasks although they get a new copy of the load test in each one"""
+    global _pile_cache
+    pile_kwargs = load_test_result.pile_kwargs
+    # profiles are compared by their layers, comparing profiles compares their private
+    # arrays, which is ambiguous for more than one layer
+    key = {**pile_kwargs, "soil_profile": pile_kwargs["soil_profile"].layers}
+    if _pile_cache is not None and _pile_cache[0] == key:
+        pile = _pile_cache[1]
+        pile.set_calibration(calibration_params)
+        return pile
+    pile = Pile(**pile_kwargs, calibration_params=calibration_params)
+    _pile_cache = (key, pile)
+    return pile
+
+
+def _analyze(args, load_test_result: LoadTestResult):
+    """Pile head displacements and forces of the model built with `args`
+    They're overwritten by the next analysis"""
+    global _curve_buffers
+    calibration_params = CalibrationParams.from_array(args)
+    pile = _get_pile(calibration_params, load_test_result)
+    if _curve_buffers is None or len(_curve_buffers[0]) != pile.number_of_steps:
+        _curve_buffers = (
+            np.empty(pile.number_of_steps),
+            np.empty(pile.number_of_steps),
+        )
+    return pile.analyze(out=_curve_buffers)
+
+
+def _pile_head_forces(curve, load_test_result: LoadTestResult):
+    """Pile head forces of the analysis curve at the load test displacements"""
+    pile_head_disp, pile_head_force = curve
+    return _interp(load_test_result.displacements, pile_head_disp, pile_head_force)
+
+
+def _stash_analysis(args, cost, curve):
+    global _best_analysis
+    if _best_analysis is None or cost < _best_analysis[0]:
+        _best_analysis = (cost, np.array(args), tuple(a.copy() for a in curve))
+
+
+def _cost(args, load_test_result: LoadTestResult):
+    """Error of the model built with `args` with respect to the pile load test
+
+    It's a module level function so multiprocessing workers can pickle it,
+    every worker keeps its own opensees model and pile
+    """
+    curve = _analyze(args, load_test_result)
+    pile_head_force = _pile_head_forces(curve, load_test_result)
+    cost_ = Calibrator.least_square(pile_head_force, load_test_result.forces)
+    if np.isnan(cost_):
+        return 1e6
+    _stash_analysis(args, cost_, curve)
+    return cost_
+
+
+def _residuals(args, load_test_result: LoadTestResult):
+    """Errors of the model built with `args` at each point of the pile load test
+    Failed analyses get the same 1e6 error norm as in `_cost`"""
+    curve = _analyze(args, load_test_result)
+    residuals = _pile_head_forces(curve, load_test_result) - load_test_result.forces
+    if not np.all(np.isfinite(residuals)):
+        return np.full(residuals.shape, 1e6 / np.sqrt(residuals.size))
+    _stash_analysis(args, np.linalg.norm(residuals), curve)
+    return residuals
+
+
 class Calibrator(BaseModel):
     load_test_result: LoadTestResult
     load: float = None
     max_iter: int = 1000
     pop_size: int = 15
+    workers: int = -1
+    method: CalibrationMethods = CalibrationMethods.DifferentialEvolution
+    # differential evolution settings of the global search before a local refinement
+    coarse_max_iter: int = 50
+    coarse_pop_size: int = 8
 
     def model_post_init(self, __context: Any) -> None:
         self.load = max(self.load_test_result.forces)
 
-    def calibrate(self):
-        """Calibrate parameters to minimize the error of model with respect to pile load test"""
-        de = differential_evolution(
-            self.cost,
+    def calibrate(self, workers: int | Any | None = None):
+        """Calibrate parameters to minimize the error of model with respect to pile load test
+
+        Candidates of each generation are analyzed in parallel by `workers` processes
+        (-1 uses all cpu cores), `workers` can also be a pool with a map method,
+        like multiprocessing.Pool or concurrent.futures.ProcessPoolExecutor, it
+        defaults to Calibrator.workers
+        With trf and L-BFGS-B methods a short differential evolution finds the basin and
+        trust region reflective least squares or L-BFGS-B refines its best point, they
+        need far fewer analyses
+        Returns the calibrated params and the pile head displacements and forces of
+        their analysis"""
+        global _best_analysis
+        _best_analysis = None
+        if workers is None:
+            workers = self.workers
+        if hasattr(workers, "map"):
+            workers = workers.map
+        if self.method == CalibrationMethods.DifferentialEvolution:
+            de = self.__differential_evolution(self.max_iter, self.pop_size, workers)
+            return CalibrationParams.from_array(de.x), self.__calibrated_curve(de.x)
+        de = self.__differential_evolution(
+            self.coarse_max_iter, self.coarse_pop_size, workers
+        )
+        if self.method == CalibrationMethods.TrustRegionReflective:
+            result = least_squares(
+                _residuals,
+                de.x,
+                bounds=tuple(zip(*CalibrationParams.bounds)),
+                args=(self.load_test_result,),
+                method="trf",
+                x_scale="jac",
+            )
+        else:
+            result = minimize(
+                _cost,
+                de.x,
+                args=(self.load_test_result,),
+                method="L-BFGS-B",
+                bounds=CalibrationParams.bounds,
+                options={"finite_diff_rel_step": 1e-3},
+            )
+        return CalibrationParams.from_array(result.x), self.__calibrated_curve(result.x)
+
+    def __calibrated_curve(self, x):
+        """The winner is analyzed again only when it was analyzed by another process"""
+        if _best_analysis is not None and np.array_equal(_best_analysis[1], x):
+            return _best_analysis[2]
+        return self.load_test_result.get_pile(CalibrationParams.from_array(x)).analyze()
+
+    def __differential_evolution(self, max_iter: int, pop_size: int, workers):
+        """The default params are a good guess, so they're put in the initial population"""
+        return differential_evolution(
+            _cost,
             bounds=CalibrationParams.bounds,
-            maxiter=self.max_iter,
-            popsize=self.pop_size,
+            args=(self.load_test_result,),
+            maxiter=max_iter,
+            popsize=pop_size,
+            workers=workers,
+            updating="deferred",
+            polish=False,
+            init="sobol",
+            x0=astuple(CalibrationParams.from_default()),
+            tol=0.01,
+            atol=1.0,
+            mutation=(0.5, 1.0),
+            recombination=0.7,
         )
-        final_calibration_params = CalibrationParams.from_array(de.x)
-        return final_calibration_params
 
     def cost(self, args):
-        calibration_params = CalibrationParams.from_array(args)
-        pile = self.load_test_result.get_pile(calibration_params)
-        pile_head_disp, pile_head_force = pile.analyze()
-        pile_head_force_interp = interp1d(
-            pile_head_disp, pile_head_force, kind="linear", fill_value="extrapolate"
-        )
-        pile_head_force = pile_head_force_interp(self.load_test_result.displacements)
-        cost_ = self.least_square(pile_head_force, self.load_test_result.forces)
-        if np.isnan(cost_):
-            return 1e6
-        return cost_
+        return _cost(args, self.load_test_result)
 
     @staticmethod
     def least_square(y1, y2):
-        return np.sqrt(sum((y2 - y1) ** 2))
+        return np.linalg.norm(y2 - y1)
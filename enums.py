@@ -9,3 +9,9 @@ class OpsMaterials(enum.Enum):
 class OpsElements(enum.Enum):
     Truss = "Truss"
     ZeroLength = "zeroLength"
+
+
+class CalibrationMethods(enum.Enum):
+    DifferentialEvolution = "differential_evolution"
+    TrustRegionReflective = "trf"
+    LBFGSB = "L-BFGS-B"
@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+import math
+from dataclasses import dataclass
 from typing import Any, ClassVar
 
 import numpy as np
@@ -12,25 +14,31 @@ from materials import (
     PileFrictionMaterial,
     PileTipMaterial,
     PileStructureMaterial,
+    initial_friction_stiffness,
 )
-from tag_generator import TaggedObject
+from tag_generator import TaggedObject, reset_tags
 
 
+@dataclass(slots=True, kw_only=True)
 class Node(TaggedObject):
     depth: float
 
-    def model_post_init(self, __context: Any) -> None:
+    def __post_init__(self) -> None:
+        self.build()
+
+    def build(self):
         """Generate the object on the ops side"""
         ops.node(self.tag, self.depth)
 
 
+@dataclass(slots=True, kw_only=True)
 class SoilElement(TaggedObject):
     fixed_node: Node
     pile_joined_node: Node
     material: PileFrictionMaterial | PileTipMaterial
     ops_element_type: OpsElements = OpsElements.ZeroLength.value
 
-    def model_post_init(self, __context: Any) -> None:
+    def __post_init__(self) -> None:
         """
         First build nodes one that is fixed, another that be attached to pile structure
         Then build the material at the specified depth
@@ -50,6 +58,7 @@ class SoilElement(TaggedObject):
         )
 
 
+@dataclass(slots=True, kw_only=True)
 class PileElement(TaggedObject):
     first_node: Node
     second_node: Node
@@ -64,7 +73,10 @@ class PileElement(TaggedObject):
             return self.area
         return np.pi * (self.pile_radius**2)
 
-    def model_post_init(self, __context: Any) -> None:
+    def __post_init__(self) -> None:
+        self.build()
+
+    def build(self):
         """
         first create nodes
         then create the material
@@ -82,7 +94,8 @@ class PileElement(TaggedObject):
         )
 
 
-class CalibrationParams(BaseModel):
+@dataclass(slots=True, frozen=True)
+class CalibrationParams:
     Rfb: float
     Sbu: float
     alpha21: float
@@ -96,13 +109,20 @@ class CalibrationParams(BaseModel):
 
     @staticmethod
     def from_array(args):
-        return CalibrationParams(Rfb=args[0], Sbu=args[1], alpha21=args[2], Rfs=args[3])
+        return CalibrationParams(*args)
 
     @staticmethod
     def from_default():
         return CalibrationParams(Rfb=1.0, Sbu=5e-3, alpha21=0.01, Rfs=1.0)
 
 
+_active_pile: Pile | None = None  # the pile that is built on the ops side
+
+# share of load steps that are spent below LOW_LOAD_FRACTION of the pile head load
+LOW_LOAD_FRACTION = 0.3
+LOW_LOAD_STEPS_RATIO = 0.375
+
+
 class Pile(BaseModel):
     pile_length: float
     pile_radius: float
@@ -116,16 +136,58 @@ class Pile(BaseModel):
     number_of_steps: int = 300
     pile_nodes: list[Node] = []
     fixed_nodes: list[Node] = []
+    pile_elements: list[PileElement] = []
     materials: list[PileFrictionMaterial | PileTipMaterial] = []
     soil_elements: list[SoilElement] = []
+    _ke_friction: np.ndarray | None = None
+    _tau_su: np.ndarray | None = None
+    _head_node: Node | None = None
 
     def model_post_init(self, __context: Any) -> None:
+        self.build_topology()
+        self.set_calibration(self.calibration_params)
+
+    @classmethod
+    def from_hollow_section(cls, radius: float, thickness: float, **kwargs) -> Pile:
+        """Pile with a hollow circular section of outer `radius` and wall `thickness`"""
+        return cls(
+            pile_radius=radius,
+            area=cls.hollow_section_area(radius, thickness),
+            **kwargs,
+        )
+
+    @staticmethod
+    def hollow_section_area(radius: float, thickness: float) -> float:
+        """Same as pi * (radius**2 - (radius - thickness)**2) without the cancellation"""
+        return math.pi * thickness * (2 * radius - thickness)
+
+    def build_topology(self):
+        """Build the parts of the model that don't depend on calibration params:
+        pile structure material, nodes, fixed dofs and pile structure elements"""
+        global _active_pile
         self.__initialization()
+        reset_tags()
         self.pile_structure_material = PileStructureMaterial(
             elasticity_module=self.elasticity_modulus
         )
-        self.__mesh()
-        self.__generate_elements()
+        depths = self.__mesh()
+        self._ke_friction, self._tau_su = self._compute_soil_arrays(depths)
+        self.__generate_pile_structura_elements()
+        _active_pile = self
+
+    def set_calibration(self, calibration_params: CalibrationParams):
+        """Replace soil springs with the ones of the calibration params
+        Opensees can neither redefine nor remove a material, so the ops domain is wiped
+        and the topology is defined again from the existing objects"""
+        if _active_pile is not self:
+            self.build_topology()
+        elif self.soil_elements:
+            self.__initialization()
+            self.__rebuild_topology()
+        self.calibration_params = calibration_params
+        self.materials = []
+        self.soil_elements = []
+        self.__generate_soil_elements()
         self.apply_load_at_pile_head()
 
     @staticmethod
@@ -135,26 +197,44 @@ class Pile(BaseModel):
 
     @property
     def __pile_head_node(self):
-        return list(filter(lambda node: node.depth == 0, self.pile_nodes))[0]
+        return self._head_node
 
     def __mesh(self):
         depths = np.linspace(0, self.pile_length, self.number_of_node)
         self.pile_nodes = [Node(depth=depth) for depth in depths]
+        self._head_node = self.pile_nodes[0]
         self.fixed_nodes = [Node(depth=depth) for depth in depths]
-        # fix them
+        self.__fix_nodes()
+        return depths
+
+    def __fix_nodes(self):
         for node in self.fixed_nodes:
             ops.fix(node.tag, 1)
 
+    def __rebuild_topology(self):
+        self.pile_structure_material.build()
+        for node in self.pile_nodes + self.fixed_nodes:
+            node.build()
+        self.__fix_nodes()
+        for pile_element in self.pile_elements:
+            pile_element.build()
+
+    def _compute_soil_arrays(self, depths: np.ndarray):
+        """Initial friction stiffness and ultimate friction stress at each pile node
+        They don't depend on calibration params, so they are computed once per pile
+        for all the depths at once"""
+        ke_friction = initial_friction_stiffness(
+            self.soil_profile, self.pile_radius, depths, self.__pile_element_length
+        )
+        tau_su = self.soil_profile.tau_f(depths)
+        return ke_friction, tau_su
+
     def __is_tip_node(self, node: Node) -> bool:
         return node.depth == self.pile_length
 
-    def __generate_elements(self):
-        self.__generate_pile_structura_elements()
-        self.__generate_soil_elements()
-
     def __generate_pile_structura_elements(self):
         """First create pile structure elements then assign soil springs to each node of pile structure"""
-        for first_node, second_node in zip(self.pile_nodes, self.pile_nodes[1:]):
+        self.pile_elements = [
             PileElement(
                 first_node=first_node,
                 second_node=second_node,
@@ -162,6 +242,8 @@ class Pile(BaseModel):
                 material=self.pile_structure_material,
                 area=self.area,
             )
+            for first_node, second_node in zip(self.pile_nodes, self.pile_nodes[1:])
+        ]
 
     @property
     def __pile_element_length(self):
@@ -170,7 +252,9 @@ class Pile(BaseModel):
     def __generate_soil_elements(self):
         """First generate spring materials
         then generate elements"""
-        for pile_node, fixed_node in zip(self.pile_nodes, self.fixed_nodes):
+        for i, (pile_node, fixed_node) in enumerate(
+            zip(self.pile_nodes, self.fixed_nodes)
+        ):
             if self.__is_tip_node(pile_node):
                 soil_material = PileTipMaterial(
                     soil_profile=self.soil_profile,
@@ -186,6 +270,8 @@ class Pile(BaseModel):
                     depth=pile_node.depth,
                     pile_element_length=self.__pile_element_length,
                     Rfs=self.calibration_params.Rfs,
+                    precomputed_ke=self._ke_friction[i],
+                    precomputed_tau_su=self._tau_su[i],
                 )
             self.materials.append(soil_material)
             self.soil_elements.append(
@@ -201,20 +287,53 @@ class Pile(BaseModel):
         ops.pattern("Plain", 1, 1)
         ops.load(self.__pile_head_node.tag, self.load)
 
-    def analyze(self):
+    def __load_steps(self) -> list[tuple[int, float]]:
+        """Number of steps and load factor increment of each loading phase
+        Steps are denser below LOW_LOAD_FRACTION of the load, where most soil springs
+        pass the knee of their curves, every phase gets at least one step so the last
+        step always reaches the full load"""
+        if self.number_of_steps < 2:
+            return [(1, 1.0)] if self.number_of_steps == 1 else []
+        low_load_steps = round(self.number_of_steps * LOW_LOAD_STEPS_RATIO)
+        low_load_steps = min(max(low_load_steps, 1), self.number_of_steps - 1)
+        high_load_steps = self.number_of_steps - low_load_steps
+        return [
+            (low_load_steps, LOW_LOAD_FRACTION / low_load_steps),
+            (high_load_steps, (1 - LOW_LOAD_FRACTION) / high_load_steps),
+        ]
+
+    def analyze(self, out: tuple[np.ndarray, np.ndarray] | None = None):
+        """Pile head displacements and forces of every load step
+        They're written into the `out` arrays if given, so repeated analyses, like the
+        ones of a calibration, don't allocate new arrays"""
+        if out is None:
+            out = (np.empty(self.number_of_steps), np.empty(self.number_of_steps))
+        head_displacement, head_force = out
+        load_steps = self.__load_steps()
+        if not load_steps:
+            return head_displacement, head_force
         ops.system("BandSPD")
-        ops.numberer("RCM")
+        # nodes are tagged along the pile so their plain numbering is already banded,
+        # reverse Cuthill-McKee only adds its graph traversal to every analysis
+        ops.numberer("Plain")
         ops.constraints("Plain")
-        ops.integrator("LoadControl", 1.0 / self.number_of_steps)
-        ops.algorithm("Newton")
+        ops.integrator("LoadControl", load_steps[0][1])
+        ops.algorithm("Linear")
         ops.analysis("Static")
-        head_displacement = []
-        head_force = list()
-        for step in range(self.number_of_steps):
-            ops.analyze(1)
-            head_force.append(ops.getLoadFactor(1) * self.load)
-            head_displacement.append(ops.nodeDisp(self.__pile_head_node.tag, 1))
-        return [
-            head_displacement,
-            head_force,
-        ]
+        # load factors of all steps are known in advance, only displacements are solved
+        steps, load_factor_increments = zip(*load_steps)
+        np.cumsum(np.repeat(load_factor_increments, steps), out=head_force)
+        head_force *= self.load
+        head_node_tag = self.__pile_head_node.tag
+        step = 0
+        for steps, load_factor_increment in load_steps:
+            ops.integrator("LoadControl", load_factor_increment)
+            for _ in range(steps):
+                if ops.analyze(1) != 0:
+                    # opensees reverts a failed step, displacements of the failed and
+                    # remaining steps are unknown
+                    head_displacement[step:] = np.nan
+                    return head_displacement, head_force
+                head_displacement[step] = ops.nodeDisp(head_node_tag, 1)
+                step += 1
+        return head_displacement, head_force
@@ -27,17 +27,29 @@ class LoadTestResult(BaseModel):
     def max_load(self):
         return max(self.forces)
 
-    def get_pile(self, calibration_params: CalibrationParams):
-        return Pile(
+    @property
+    def number_of_steps(self):
+        """Load steps of the analysis, the force-displacement curve only needs to be fine
+        enough to interpolate at the measured displacements"""
+        return max(8 * len(self.displacements), 60)
+
+    @property
+    def pile_kwargs(self) -> dict[str, Any]:
+        """Pile arguments that don't depend on calibration params"""
+        return dict(
             pile_length=self.pile_length,
             pile_radius=self.pile_radius,
             area=self.pile_area,
             soil_profile=self.soil_profile,
             elasticity_modulus=self.pile_elasticity_modulus,
-            calibration_params=calibration_params,
             load=self.max_load,
+            number_of_steps=self.number_of_steps,
         )
 
+    def get_pile(self, calibration_params: CalibrationParams):
+        """Pile of the load test with the calibration params"""
+        return Pile(**self.pile_kwargs, calibration_params=calibration_params)
+
     @staticmethod
     def onill_1982_single_pile():
         return LoadTestResult(
@@ -47,7 +59,7 @@ class LoadTestResult(BaseModel):
             forces=np.array([0, 118e3, 250e3, 331e3, 436e3, 550e3, 600e3, 653e3]),
             pile_length=13.1,
             pile_radius=137e-3,
-            pile_area=np.pi * 137e-3**2 - np.pi * (137e-3 - 9.3e-3) ** 2,
+            pile_area=Pile.hollow_section_area(137e-3, 9.3e-3),
             pile_elasticity_modulus=210e9,
             soil_profile=SoilProfile(
                 layers=[
@@ -1,11 +1,12 @@
 from __future__ import annotations
 
-from functools import cache
+from dataclasses import dataclass
+from functools import cached_property
 from typing import Any
 
 import numpy as np
 from openseespy import opensees as ops
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict, Field
 
 from enums import OpsMaterials
 from tag_generator import TaggedObject
@@ -19,61 +20,112 @@ from tag_generator import TaggedObject
 # Tau_f(z) -> Ultimate friction stress with respect to depth
 
 
-class SoilLayer(BaseModel):
+class _DerivedValuesModel(BaseModel):
+    """Model with values derived from its fields once, when it's validated
+    The fields can't change and copies with updated fields are validated again"""
+
+    model_config = ConfigDict(frozen=True)
+
+    def model_copy(self, *, update: dict[str, Any] | None = None, deep: bool = False):
+        if update:
+            return self.model_validate({**self.model_dump(), **update})
+        return super().model_copy(deep=deep)
+
+
+class SoilLayer(_DerivedValuesModel):
     up_depth: float
     bottom_depth: float
     up_shear_modulus: float
     bottom_shear_modulus: float
     up_poisson_ratio: float
     bottom_poisson_ratio: float
-    up_tau_f: float
-    bottom_tau_f: float
+    # ultimate friction stress can be zero, like sand at the surface, but not negative
+    up_tau_f: float = Field(ge=0)
+    bottom_tau_f: float = Field(ge=0)
+    # change of properties per unit depth, they're zero for a zero thickness layer
+    _shear_modulus_slope: float = 0.0
+    _poisson_ratio_slope: float = 0.0
+    _tau_f_slope: float = 0.0
 
-    @property
+    def model_post_init(self, __context: Any) -> None:
+        if self.length == 0:
+            return
+        self._shear_modulus_slope = (
+            self.bottom_shear_modulus - self.up_shear_modulus
+        ) / self.length
+        self._poisson_ratio_slope = (
+            self.bottom_poisson_ratio - self.up_poisson_ratio
+        ) / self.length
+        self._tau_f_slope = (self.bottom_tau_f - self.up_tau_f) / self.length
+
+    @cached_property
     def length(self):
         return self.bottom_depth - self.up_depth
 
-    @property
+    @cached_property
     def avg_poisson_ratio(self):
         return (self.up_poisson_ratio + self.bottom_poisson_ratio) / 2
 
-    @property
+    @cached_property
     def max_shear_modulus(self) -> float:
         return max(self.up_shear_modulus, self.bottom_shear_modulus)
 
-    @property
+    @cached_property
     def avg_shear_modulus(self):
         return (self.up_shear_modulus + self.bottom_shear_modulus) / 2
 
     def shear_modulus(self, depth: float) -> float:
-        return self.up_shear_modulus + (
-            self.bottom_shear_modulus - self.up_shear_modulus
-        ) / (self.bottom_depth - self.up_depth) * (depth - self.up_depth)
+        return self.up_shear_modulus + self._shear_modulus_slope * (
+            depth - self.up_depth
+        )
 
     def poisson_ratio(self, depth: float) -> float:
-        return self.up_poisson_ratio + (
-            self.bottom_poisson_ratio - self.up_poisson_ratio
-        ) / (self.bottom_depth - self.up_depth) * (depth - self.up_depth)
+        return self.up_poisson_ratio + self._poisson_ratio_slope * (
+            depth - self.up_depth
+        )
 
     def tau_f(self, depth: float) -> float:
-        return self.up_tau_f + (self.bottom_tau_f - self.up_tau_f) / (
-            self.bottom_depth - self.up_depth
-        ) * (depth - self.up_depth)
+        return self.up_tau_f + self._tau_f_slope * (depth - self.up_depth)
 
 
-class SoilProfile(BaseModel):
+class SoilProfile(_DerivedValuesModel):
     layers: list[SoilLayer]
+    # layers properties as arrays, so properties of many depths are looked up at once
+    _up_depths: np.ndarray
+    _bottom_depths: np.ndarray
+    _up_shear_moduli: np.ndarray
+    _shear_modulus_slopes: np.ndarray
+    _up_poisson_ratios: np.ndarray
+    _poisson_ratio_slopes: np.ndarray
+    _up_tau_fs: np.ndarray
+    _tau_f_slopes: np.ndarray
+    # every depth of a single layer profile is in its only layer, no search is needed
+    _single_layer: bool
 
-    @property
+    def model_post_init(self, __context: Any) -> None:
+        def layers_array(name):
+            return np.array([getattr(layer, name) for layer in self.layers])
+
+        self._up_depths = layers_array("up_depth")
+        self._bottom_depths = layers_array("bottom_depth")
+        self._up_shear_moduli = layers_array("up_shear_modulus")
+        self._shear_modulus_slopes = layers_array("_shear_modulus_slope")
+        self._up_poisson_ratios = layers_array("up_poisson_ratio")
+        self._poisson_ratio_slopes = layers_array("_poisson_ratio_slope")
+        self._up_tau_fs = layers_array("up_tau_f")
+        self._tau_f_slopes = layers_array("_tau_f_slope")
+        self._single_layer = len(self.layers) == 1
+
+    @cached_property
     def max_shear_modulus(self):
         return max(layer.max_shear_modulus for layer in self.layers)
 
-    @property
+    @cached_property
     def pile_length(self):
         """It's assumed that SoilProfile contains soil layers that are at the length of pile"""
         return sum(layer.length for layer in self.layers)
 
-    @property
+    @cached_property
     def avg_poisson_ratio(self):
         """How to calculate avg poisson ratio
         Simple avg: sum(layer.poisson_ratio) / count of layers
@@ -84,39 +136,126 @@ class SoilProfile(BaseModel):
             / self.pile_length
         )
 
-    def __find_layer(self, depth: float) -> SoilLayer:
-        for layer in self.layers:
-            if layer.up_depth <= depth <= layer.bottom_depth:
-                return layer
-        raise Exception(f"Not found layer for depth: {depth}!")
+    @cached_property
+    def rou_m(self) -> float:
+        """Coefficient of enhanced ratio
+        It's not related to depth
+        C. Y. Lee, “Settlement of pile groups—practical approach,” J. Geotech. Eng., Vol. 119, No. 9, pp. 1449–1461, 1993.
+        """
+        return sum(
+            layer.avg_shear_modulus
+            * layer.length
+            / (self.max_shear_modulus * self.pile_length)
+            for layer in self.layers
+        )
 
-    def shear_modulus(self, depth: float) -> float:
-        layer = self.__find_layer(depth)
-        return layer.shear_modulus(depth)
+    @cached_property
+    def rm(self):
+        return 2.5 * self.pile_length * self.rou_m * (1 - self.avg_poisson_ratio)
+
+    def __find_layer(self, depth: float | np.ndarray) -> int | np.ndarray:
+        """Index of the layer that contains the depth, depth can be an array of depths"""
+        if self._single_layer:
+            if np.any(depth < self._up_depths[0]) or np.any(
+                depth > self._bottom_depths[0]
+            ):
+                raise ValueError(f"Not found layer for depth: {depth}!")
+            return 0
+        i = np.searchsorted(self._bottom_depths, depth)
+        if np.any(i == len(self.layers)) or np.any(
+            depth < self._up_depths[np.minimum(i, len(self.layers) - 1)]
+        ):
+            raise ValueError(f"Not found layer for depth: {depth}!")
+        return i
+
+    def shear_modulus(self, depth: float | np.ndarray) -> float | np.ndarray:
+        i = self.__find_layer(depth)
+        return self._up_shear_moduli[i] + self._shear_modulus_slopes[i] * (
+            depth - self._up_depths[i]
+        )
 
-    def poisson_ratio(self, depth: float) -> float:
-        layer = self.__find_layer(depth)
-        return layer.poisson_ratio(depth)
+    def poisson_ratio(self, depth: float | np.ndarray) -> float | np.ndarray:
+        i = self.__find_layer(depth)
+        return self._up_poisson_ratios[i] + self._poisson_ratio_slopes[i] * (
+            depth - self._up_depths[i]
+        )
 
-    def tau_f(self, depth: float) -> float:
-        layer = self.__find_layer(depth)
-        return layer.tau_f(depth)
+    def tau_f(self, depth: float | np.ndarray) -> float | np.ndarray:
+        i = self.__find_layer(depth)
+        return self._up_tau_fs[i] + self._tau_f_slopes[i] * (depth - self._up_depths[i])
 
-    @property
+    @cached_property
     def tip_shear_modulus(self):
         return self.shear_modulus(self.pile_length)
 
-    @property
+    @cached_property
     def tip_poisson_ratio(self):
         return self.poisson_ratio(self.pile_length)
 
 
+# exponents of the geometric friction curve samples, see _sample_displacements
+_SAMPLE_EXPONENTS = np.linspace(0, 1, 20)
+_SAMPLE_EXPONENTS.flags.writeable = False
+
+
+def _sample_displacements(knee: float) -> np.ndarray:
+    """20 geometric sample displacements of a friction curve from knee / 100 to 0.1,
+    plus zero. The curve is linear within 1% below knee / 100, so no samples are
+    spent there. The first sample is capped at 1e-3, so stiff springs with a large
+    knee still get samples over the small displacements of the analysis"""
+    first = min(knee / 100, 1e-3)
+    displacements = np.empty(len(_SAMPLE_EXPONENTS) + 1)
+    displacements[0] = 0.0
+    displacements[1:] = first * (0.1 / first) ** _SAMPLE_EXPONENTS
+    return displacements
+
+
+# friction curve of a spring without friction, it carries no force
+_NO_FRICTION_CURVE = (np.array([0.0, 0.1]), np.zeros(2))
+for _array in _NO_FRICTION_CURVE:
+    _array.flags.writeable = False
+
+
+def _friction_curve(a: float, b: float):
+    """Hyperbolic friction curve: force = displacement / (a + b * displacement)
+    its knee is at displacement = a / b, where a + b * displacement doubles"""
+    displacements = _sample_displacements(a / b)
+    forces = np.multiply(b, displacements)
+    forces += a
+    np.divide(displacements, forces, out=forces)
+    return displacements, forces
+
+
+def friction_surface_area(pile_radius: float, pile_element_length: float) -> float:
+    """Side surface of a pile element, where the soil friction acts on"""
+    return pile_element_length * 2 * np.pi * pile_radius
+
+
+def initial_friction_stiffness(
+    soil_profile: SoilProfile,
+    pile_radius: float,
+    depth: float | np.ndarray,
+    pile_element_length: float,
+) -> float | np.ndarray:
+    """Initial stiffness of pile side friction in (kN/m3), depth can be an array of
+    depths"""
+    return (
+        soil_profile.shear_modulus(depth)
+        / (pile_radius * np.log(soil_profile.rm / pile_radius))
+        * friction_surface_area(pile_radius, pile_element_length)
+    )
+
+
+@dataclass(slots=True, kw_only=True)
 class PileFrictionMaterial(TaggedObject):
     soil_profile: SoilProfile
     pile_radius: float
     depth: float
     pile_element_length: float
     Rfs: float
+    # precomputed by pile, they don't depend on Rfs
+    precomputed_ke: float | None = None
+    precomputed_tau_su: float | None = None
     ops_material_type: OpsMaterials = OpsMaterials.ElasticMultiLinear.value
 
     @property
@@ -125,40 +264,28 @@ class PileFrictionMaterial(TaggedObject):
 
     @property
     def pile_element_surface_area(self):
-        return self.pile_element_length * self.pile_diameter
+        return friction_surface_area(self.pile_radius, self.pile_element_length)
 
     @property
     def rou_m(self) -> float:
-        """Coefficient of enhanced ratio
-        It's not related to depth
-        C. Y. Lee, “Settlement of pile groups—practical approach,” J. Geotech. Eng., Vol. 119, No. 9, pp. 1449–1461, 1993.
-        """
-        return sum(
-            layer.avg_shear_modulus
-            * layer.length
-            / (self.soil_profile.max_shear_modulus * self.soil_profile.pile_length)
-            for layer in self.soil_profile.layers
-        )
+        return self.soil_profile.rou_m
 
     @property
     def rm(self):
-        return (
-            2.5
-            * self.soil_profile.pile_length
-            * self.rou_m
-            * (1 - self.soil_profile.avg_poisson_ratio)
-        )
+        return self.soil_profile.rm
 
     def Ke_friction(self) -> float:
         """Initial stiffness of pile side friction in (kN/m3)"""
-        return (
-            self.soil_profile.shear_modulus(self.depth)
-            / (self.pile_radius * np.log(self.rm / self.pile_radius))
-            * self.pile_element_surface_area
+        if self.precomputed_ke is not None:
+            return self.precomputed_ke
+        return initial_friction_stiffness(
+            self.soil_profile, self.pile_radius, self.depth, self.pile_element_length
         )
 
     def tau_ult(self):
-        tau_su = self.soil_profile.tau_f(self.depth)
+        tau_su = self.precomputed_tau_su
+        if tau_su is None:
+            tau_su = self.soil_profile.tau_f(self.depth)
         return (tau_su / self.Rfs) * self.pile_element_surface_area
 
     def b(self):
@@ -167,27 +294,22 @@ class PileFrictionMaterial(TaggedObject):
     def a(self):
         return 1 / self.Ke_friction()
 
-    @staticmethod
-    @cache
-    def __get_sample_displacements():
-        return np.array([0] + np.geomspace(1e-12, 0.1, 50).tolist())
-
-    def __get_forces(self, strains):
-        return strains / (self.a() + self.b() * strains)
-
-    def model_post_init(self, __context: Any) -> None:
-        displacements = self.__get_sample_displacements()
-        forces = self.__get_forces(displacements)
+    def __post_init__(self) -> None:
+        if self.tau_ult() == 0:
+            displacements, forces = _NO_FRICTION_CURVE
+        else:
+            displacements, forces = _friction_curve(self.a(), self.b())
         ops.uniaxialMaterial(
             self.ops_material_type,
             self.tag,
             "-strain",
-            *displacements,
+            *displacements.tolist(),
             "-stress",
-            *forces,
+            *forces.tolist(),
         )
 
 
+@dataclass(slots=True, kw_only=True)
 class PileTipMaterial(TaggedObject):
     soil_profile: SoilProfile
     pile_radius: float
@@ -232,23 +354,27 @@ class PileTipMaterial(TaggedObject):
             [0.0, self.Sbu * self.k1, self.Sbu * self.k1 + (0.1 - self.Sbu) * self.k2]
         )
 
-    def model_post_init(self, __context: Any) -> None:
+    def __post_init__(self) -> None:
         displacements = self.__get_displacements()
         forces = self.__get_forces()
         ops.uniaxialMaterial(
             self.ops_material_type,
             self.tag,
             "-strain",
-            *displacements,
+            *displacements.tolist(),
             "-stress",
-            *forces,
+            *forces.tolist(),
         )
 
 
+@dataclass(slots=True, kw_only=True)
 class PileStructureMaterial(TaggedObject):
     elasticity_module: float
 
-    def model_post_init(self, __context: Any) -> None:
+    def __post_init__(self) -> None:
+        self.build()
+
+    def build(self):
         ops.uniaxialMaterial(
             OpsMaterials.Elastic.value, self.tag, self.elasticity_module
         )
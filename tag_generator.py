@@ -1,13 +1,19 @@
-from pydantic import BaseModel, Field
+from dataclasses import dataclass, field
+from itertools import count
 
-counter = 0
+_counter = count(1)
 
 
 def get_tag():
-    global counter
-    counter += 1
-    return counter
+    return next(_counter)
 
 
-class TaggedObject(BaseModel):
-    tag: int = Field(default_factory=get_tag)
+def reset_tags():
+    """Start tags from 1 again, only safe when the ops domain is wiped"""
+    global _counter
+    _counter = count(1)
+
+
+@dataclass(slots=True, kw_only=True)
+class TaggedObject:
+    tag: int = field(default_factory=get_tag)
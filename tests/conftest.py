@@ -0,0 +1,59 @@
+import pytest
+
+from fea_model import Pile
+from materials import SoilProfile, SoilLayer
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--plot",
+        action="store_true",
+        help="plot force-displacement curves of the tests",
+    )
+
+
+def pytest_configure(config):
+    # without --plot nothing may open a window, pyplot is imported lazily by the tests
+    if not config.getoption("--plot"):
+        import matplotlib
+
+        matplotlib.use("Agg")
+
+
+@pytest.fixture
+def plot(request):
+    return request.config.getoption("--plot")
+
+
+@pytest.fixture(scope="session")
+def onill_soil_profile():
+    return SoilProfile(
+        layers=[
+            SoilLayer(
+                up_depth=0,
+                bottom_depth=13.1,
+                up_shear_modulus=65e6,
+                bottom_shear_modulus=65e6,
+                up_poisson_ratio=0.5,
+                bottom_poisson_ratio=0.5,
+                up_tau_f=19e3,
+                bottom_tau_f=93e3,
+            ),
+        ]
+    )
+
+
+@pytest.fixture(scope="session")
+def onill_pile_factory(onill_soil_profile):
+    """Builds the o'nill 1982 single pile, tests only pass the arguments they vary"""
+
+    def factory(**kwargs) -> Pile:
+        return Pile.from_hollow_section(
+            pile_length=13.1,
+            radius=137e-3,
+            thickness=9.3e-3,
+            soil_profile=onill_soil_profile,
+            **kwargs,
+        )
+
+    return factory
@@ -1,19 +1,35 @@
-from matplotlib import pyplot as plt
+import pickle
+from dataclasses import astuple
 
-from calibrator import Calibrator
+import numpy as np
+import pytest
+from scipy.interpolate import interp1d
+
+import calibrator as calibrator_module
+from calibrator import (
+    Calibrator,
+    _cost,
+    _get_pile,
+    _interp,
+    _residuals,
+)
+from enums import CalibrationMethods
 from fea_model import CalibrationParams
 from load_tests import LoadTestResult
+from materials import SoilLayer, SoilProfile
 
 
-def test_onill_1982():
+def test_onill_1982(plot):
     load_test_result = LoadTestResult.onill_1982_single_pile()
     calibrator = Calibrator(load_test_result=load_test_result)
-    final_calibration_params = calibrator.calibrate()
-    pile = load_test_result.get_pile(final_calibration_params)
-    calibrated_result = pile.analyze()
+    final_calibration_params, calibrated_result = calibrator.calibrate()
     pile = load_test_result.get_pile(CalibrationParams.from_default())
     result = pile.analyze()
     print(f"calibrated params: {final_calibration_params}")
+    if not plot:
+        return
+    from matplotlib import pyplot as plt
+
     plt.figure()
     plt.plot(calibrated_result[0], calibrated_result[1], label="calibrated FEA")
     plt.plot(result[0], result[1], label="FEA")
@@ -24,3 +40,82 @@ def test_onill_1982():
     )
     plt.legend()
     plt.show()
+
+
+def test_interp_extrapolates_like_interp1d():
+    xp = np.array([1.0, 2.0, 4.0, 7.0])
+    fp = np.array([3.0, 1.0, 5.0, 6.0])
+    x = np.array([0.0, 0.5, 1.0, 3.0, 6.0, 7.0, 9.0])
+    expected = interp1d(xp, fp, kind="linear", fill_value="extrapolate")(x)
+    np.testing.assert_allclose(_interp(x, xp, fp), expected)
+
+
+def test_residuals_norm_is_cost():
+    load_test_result = LoadTestResult.onill_1982_single_pile()
+    args = [0.9, 3e-3, 0.3, 0.85]
+    residuals = _residuals(args, load_test_result)
+    assert residuals.shape == load_test_result.forces.shape
+    np.testing.assert_allclose(np.linalg.norm(residuals), _cost(args, load_test_result))
+
+
+def test_reused_pile_follows_load_test_changes():
+    load_test_result = LoadTestResult.onill_1982_single_pile()
+    calibration_params = CalibrationParams.from_default()
+    _get_pile(calibration_params, load_test_result)
+    changed_load_test_result = load_test_result.model_copy(
+        update={"pile_elasticity_modulus": 100e9, "pile_radius": 0.2}
+    )
+    pile = _get_pile(calibration_params, changed_load_test_result)
+    assert pile.elasticity_modulus == 100e9
+    assert pile.pile_radius == 0.2
+
+
+def test_cost_of_pickled_multi_layer_load_test():
+    load_test_result = LoadTestResult.onill_1982_single_pile()
+    layer = load_test_result.soil_profile.layers[0]
+    two_layer_load_test_result = load_test_result.model_copy(
+        update={
+            "soil_profile": SoilProfile(
+                layers=[
+                    SoilLayer(**{**layer.model_dump(), "bottom_depth": 6.55}),
+                    SoilLayer(**{**layer.model_dump(), "up_depth": 6.55}),
+                ]
+            )
+        }
+    )
+    args = [0.9, 3e-3, 0.3, 0.85]
+    cost = _cost(args, two_layer_load_test_result)
+    # workers get a pickled copy of the load test in every task
+    pickled_copy = pickle.loads(pickle.dumps(two_layer_load_test_result))
+    assert _cost(args, pickled_copy) == cost
+
+
+def test_calibrate_returns_curve_of_calibrated_params():
+    load_test_result = LoadTestResult.onill_1982_single_pile()
+    calibrator = Calibrator(load_test_result=load_test_result, max_iter=5)
+    calibration_params, curve = calibrator.calibrate(workers=1)
+    # serial calibration reuses the stashed curve of the winner
+    np.testing.assert_array_equal(
+        calibrator_module._best_analysis[1], astuple(calibration_params)
+    )
+    expected_curve = load_test_result.get_pile(calibration_params).analyze()
+    np.testing.assert_allclose(curve, expected_curve)
+    assert _cost(astuple(calibration_params), load_test_result) <= _cost(
+        astuple(CalibrationParams.from_default()), load_test_result
+    )
+
+
+@pytest.mark.parametrize("method", list(CalibrationMethods))
+def test_calibration_methods(method):
+    load_test_result = LoadTestResult.onill_1982_single_pile()
+    calibrator = Calibrator(
+        load_test_result=load_test_result,
+        method=method,
+        max_iter=3,
+        coarse_max_iter=3,
+    )
+    calibration_params, _ = calibrator.calibrate(workers=1)
+    args = np.array(astuple(calibration_params))
+    assert np.all(np.isfinite(args))
+    lower_bounds, upper_bounds = np.array(CalibrationParams.bounds).T
+    assert np.all((lower_bounds <= args) & (args <= upper_bounds))
@@ -1,10 +1,6 @@
-import time
-
 import numpy as np
-from matplotlib import pyplot as plt
 
-from fea_model import Pile, CalibrationParams
-from materials import SoilProfile, SoilLayer
+from fea_model import CalibrationParams
 
 onill1982_single_pile_force_deformation = np.array(
     [
@@ -14,26 +10,8 @@ onill1982_single_pile_force_deformation = np.array(
 )
 
 
-def test_onill_1982():
-    soil_profile = SoilProfile(
-        layers=[
-            SoilLayer(
-                up_depth=0,
-                bottom_depth=13.1,
-                up_shear_modulus=65e6,
-                bottom_shear_modulus=65e6,
-                up_poisson_ratio=0.5,
-                bottom_poisson_ratio=0.5,
-                up_tau_f=19e3,
-                bottom_tau_f=93e3,
-            ),
-        ]
-    )
-    pile = Pile(
-        pile_length=13.1,
-        pile_radius=137e-3,
-        area=np.pi * (137e-3) ** 2 - np.pi * (137e-3 - 9.3e-3) ** 2,
-        soil_profile=soil_profile,
+def test_onill_1982(onill_pile_factory, plot):
+    pile = onill_pile_factory(
         elasticity_modulus=210e9,
         calibration_params=CalibrationParams(
             Rfb=1,
@@ -44,6 +22,10 @@ def test_onill_1982():
         load=653e3,
     )
     result = pile.analyze()
+    if not plot:
+        return
+    from matplotlib import pyplot as plt
+
     plt.figure()
     plt.plot(result[0], result[1], label="fea")
     plt.plot(
@@ -53,5 +35,5 @@ def test_onill_1982():
     )
     plt.legend()
     plt.show(block=False)
-    time.sleep(1)
+    plt.pause(0.001)
     plt.close()
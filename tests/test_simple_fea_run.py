@@ -1,10 +1,63 @@
 import numpy as np
+import pytest
 
+import fea_model
 from fea_model import Pile, CalibrationParams
+from load_tests import LoadTestResult
 from materials import SoilProfile, SoilLayer
 
 
-def test_simple_onill_fea_run():
+def test_simple_onill_fea_run(onill_pile_factory):
+    pile = onill_pile_factory(
+        elasticity_modulus=200e9,
+        calibration_params=CalibrationParams(
+            Rfb=0.9,
+            Sbu=5e-3,
+            alpha21=0.01,
+            Rfs=1,
+        ),
+        load=1.1e6,
+    )
+    pile.analyze()
+
+
+def test_set_calibration_matches_new_pile():
+    load_test_result = LoadTestResult.onill_1982_single_pile()
+    calibration_params = CalibrationParams(Rfb=0.9, Sbu=3e-3, alpha21=0.3, Rfs=0.85)
+    pile = load_test_result.get_pile(CalibrationParams.from_default())
+    pile.analyze()
+    pile.set_calibration(calibration_params)
+    reused_result = pile.analyze()
+    new_result = Pile(
+        **load_test_result.pile_kwargs, calibration_params=calibration_params
+    ).analyze()
+    np.testing.assert_allclose(reused_result, new_result)
+
+
+def test_get_pile_returns_independent_piles():
+    load_test_result = LoadTestResult.onill_1982_single_pile()
+    calibration_params = CalibrationParams(Rfb=0.9, Sbu=3e-3, alpha21=0.3, Rfs=0.85)
+    pile = load_test_result.get_pile(CalibrationParams.from_default())
+    other_pile = load_test_result.get_pile(calibration_params)
+    assert pile is not other_pile
+    assert pile.calibration_params == CalibrationParams.from_default()
+
+
+@pytest.mark.parametrize("number_of_steps", [0, 1, 2, 3, 60])
+def test_last_step_reaches_full_load(onill_pile_factory, number_of_steps):
+    pile = onill_pile_factory(
+        elasticity_modulus=210e9,
+        calibration_params=CalibrationParams.from_default(),
+        load=653e3,
+        number_of_steps=number_of_steps,
+    )
+    head_displacement, head_force = pile.analyze()
+    assert len(head_displacement) == len(head_force) == number_of_steps
+    if number_of_steps:
+        assert head_force[-1] == pytest.approx(653e3)
+
+
+def test_zero_surface_friction():
     soil_profile = SoilProfile(
         layers=[
             SoilLayer(
@@ -14,23 +67,40 @@ def test_simple_onill_fea_run():
                 bottom_shear_modulus=65e6,
                 up_poisson_ratio=0.5,
                 bottom_poisson_ratio=0.5,
-                up_tau_f=19e3,
+                up_tau_f=0,
                 bottom_tau_f=93e3,
             ),
         ]
     )
-    pile = Pile(
+    pile = Pile.from_hollow_section(
+        radius=137e-3,
+        thickness=9.3e-3,
         pile_length=13.1,
-        pile_radius=137e-3,
-        area=np.pi * (137e-3) ** 2 - np.pi * (137e-3 - 9.3e-3) ** 2,
         soil_profile=soil_profile,
-        elasticity_modulus=200e9,
-        calibration_params=CalibrationParams(
-            Rfb=0.9,
-            Sbu=5e-3,
-            alpha21=0.01,
-            Rfs=1,
-        ),
-        load=1.1e6,
+        elasticity_modulus=210e9,
+        calibration_params=CalibrationParams.from_default(),
+        load=653e3,
     )
-    pile.analyze()
+    head_displacement, head_force = pile.analyze()
+    assert np.all(np.isfinite(head_displacement))
+    assert head_force[-1] == pytest.approx(653e3)
+
+
+def test_failed_step_gives_nan_displacements(onill_pile_factory, monkeypatch):
+    pile = onill_pile_factory(
+        elasticity_modulus=210e9,
+        calibration_params=CalibrationParams.from_default(),
+        load=653e3,
+        number_of_steps=10,
+    )
+    analyze = fea_model.ops.analyze
+    steps = iter(range(10))
+
+    def failing_analyze(number_of_steps):
+        # the sixth step fails like a diverged analysis of opensees
+        return -3 if next(steps) == 5 else analyze(number_of_steps)
+
+    monkeypatch.setattr(fea_model.ops, "analyze", failing_analyze)
+    head_displacement, _ = pile.analyze()
+    assert np.all(np.isfinite(head_displacement[:5]))
+    assert np.all(np.isnan(head_displacement[5:]))
@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+from pydantic import ValidationError
+
+from materials import SoilProfile, SoilLayer
+
+
+def test_multi_layer_lookup():
+    layers = [
+        SoilLayer(
+            up_depth=0,
+            bottom_depth=5,
+            up_shear_modulus=20e6,
+            bottom_shear_modulus=40e6,
+            up_poisson_ratio=0.3,
+            bottom_poisson_ratio=0.4,
+            up_tau_f=10e3,
+            bottom_tau_f=20e3,
+        ),
+        SoilLayer(
+            up_depth=5,
+            bottom_depth=12,
+            up_shear_modulus=50e6,
+            bottom_shear_modulus=120e6,
+            up_poisson_ratio=0.3,
+            bottom_poisson_ratio=0.3,
+            up_tau_f=30e3,
+            bottom_tau_f=44e3,
+        ),
+    ]
+    soil_profile = SoilProfile(layers=layers)
+    depths = np.array([0, 2.5, 5, 6, 12])
+    # a depth on the boundary of two layers belongs to the upper layer
+    depth_layers = [layers[0], layers[0], layers[0], layers[1], layers[1]]
+    for name in ("shear_modulus", "poisson_ratio", "tau_f"):
+        expected = [
+            getattr(layer, name)(depth) for layer, depth in zip(depth_layers, depths)
+        ]
+        np.testing.assert_allclose(getattr(soil_profile, name)(depths), expected)
+        assert getattr(soil_profile, name)(6.0) == expected[3]
+
+
+def test_single_layer_lookup():
+    layer = SoilLayer(
+        up_depth=0,
+        bottom_depth=10,
+        up_shear_modulus=20e6,
+        bottom_shear_modulus=40e6,
+        up_poisson_ratio=0.3,
+        bottom_poisson_ratio=0.4,
+        up_tau_f=10e3,
+        bottom_tau_f=20e3,
+    )
+    soil_profile = SoilProfile(layers=[layer])
+    depths = np.array([0, 2.5, 10])
+    for name in ("shear_modulus", "poisson_ratio", "tau_f"):
+        expected = [getattr(layer, name)(depth) for depth in depths]
+        np.testing.assert_allclose(getattr(soil_profile, name)(depths), expected)
+    with pytest.raises(ValueError, match="Not found layer"):
+        soil_profile.tau_f(np.array([5, 11]))
+
+
+def test_soil_models_are_frozen():
+    layer = SoilLayer(
+        up_depth=0,
+        bottom_depth=10,
+        up_shear_modulus=20e6,
+        bottom_shear_modulus=40e6,
+        up_poisson_ratio=0.3,
+        bottom_poisson_ratio=0.4,
+        up_tau_f=10e3,
+        bottom_tau_f=20e3,
+    )
+    soil_profile = SoilProfile(layers=[layer])
+    # derived slopes and arrays would go stale if a field could change
+    with pytest.raises(ValidationError):
+        layer.bottom_tau_f = 30e3
+    with pytest.raises(ValidationError):
+        soil_profile.layers = []
+    # copies with updated fields derive them again
+    assert layer.model_copy(update={"bottom_tau_f": 30e3}).tau_f(10) == 30e3
+    deeper_layer = layer.model_copy(update={"bottom_depth": 20})
+    deeper_soil_profile = soil_profile.model_copy(update={"layers": [deeper_layer]})
+    assert deeper_soil_profile.tau_f(20.0) == 20e3
+    assert deeper_soil_profile.pile_length == 20